@@ -2,7 +2,11 @@
 
 (cd ../docs; make clean)
 (cd ../docs; make html)
-sudo rm -fr /var/www/html/wspr/docs
-sudo mkdir /var/www/html/wspr/docs
-sudo cp -R /home/pi/WsprryPi/docs/_build/html/* /var/www/html/wspr/docs/
-sudo chown -R www-data:www-data /var/www/html/wspr/docs
+if command -v rsync > /dev/null; then
+    # Sphinx rewrites every file, so compare contents and only copy changes
+    sudo rsync -a --checksum --delete --chown=www-data:www-data /home/pi/WsprryPi/docs/_build/html/ /var/www/html/wspr/docs/
+else
+    sudo rm -fr /var/www/html/wspr/docs
+    sudo cp -R /home/pi/WsprryPi/docs/_build/html /var/www/html/wspr/docs
+    sudo chown -R www-data:www-data /var/www/html/wspr/docs
+fi
@@ -1,12 +1,14 @@
 #!/bin/bash
 
-sudo systemctl stop wspr
-sudo systemctl stop shutdown-button
-sudo cp -f ./wspr /usr/local/bin
-sudo cp -f ./shutdown-button.py /usr/local/bin
+# Keep the installed button setting, install.sh turns it off when declined
+doTAPR=$(grep -s '^doTAPR = ' /usr/local/bin/shutdown-watch.py)
+sudo systemctl stop wspr shutdown-watch
+sudo install -o root -g root -m 0755 ./wspr ./shutdown-watch.py /usr/local/bin
+if [ -n "$doTAPR" ]; then
+    sudo sed -i "s/^doTAPR = .*/$doTAPR/" /usr/local/bin/shutdown-watch.py
+fi
 sudo cp -f ./wspr.ini /usr/local/etc
-[[ -d "/var/log/wspr" ]] || mkdir "/var/log/wspr"
-sudo cp -f ./logrotate.d /etc/logrotate.d/wspr
+sudo mkdir -p "/var/log/wspr"
+sudo install -o root -g root -m 0644 ./logrotate.d /etc/logrotate.d/wspr
 sudo systemctl daemon-reload
-sudo systemctl start wspr
-sudo systemctl start shutdown-button
+sudo systemctl start wspr shutdown-watch
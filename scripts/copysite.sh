@@ -1,7 +1,15 @@
 #!/bin/bash
 
-sudo rm -fr /var/www/html/wspr
-sudo mkdir /var/www/html/wspr
-sudo cp -R /home/pi/WsprryPi/data/* /var/www/html/wspr/
+if command -v rsync > /dev/null; then
+    # Only copy changed files, leaving the deployed docs, the ini link and
+    # any pending shutdown request alone
+    sudo rsync -a --delete --exclude=/docs --exclude=/wspr.ini --exclude=/shutdown --chown=www-data:www-data /home/pi/WsprryPi/data/ /var/www/html/wspr/
+else
+    # Clear the UI files in place, keeping the same entries rsync keeps
+    sudo mkdir -p /var/www/html/wspr
+    sudo find /var/www/html/wspr -mindepth 1 -maxdepth 1 ! -name docs ! -name wspr.ini ! -name shutdown -exec rm -fr {} +
+    sudo cp -R /home/pi/WsprryPi/data/. /var/www/html/wspr/
+    sudo chown -R www-data:www-data /var/www/html/wspr/
+fi
 sudo ln -sf /usr/local/etc/wspr.ini /var/www/html/wspr/wspr.ini
-sudo chown -R www-data:www-data /var/www/html/wspr/
+sudo chown -h www-data:www-data /var/www/html/wspr/wspr.ini
@@ -24,7 +24,7 @@ COPYRIGHT="Copyright (C) 2023-2024 Lee C. Bussy (@LBussy)"
 PACKAGE="WsprryPi"
 PACKAGENAME="Wsprry Pi"
 OWNER="lbussy"
-APTPACKAGES="apache2 php libraspberrypi-bin"
+APTPACKAGES="apache2 php libraspberrypi-bin python3-inotify-simple"
 WWWFILES="android-chrome-192x192.png android-chrome-512x512.png antenna.svg apple-touch-icon.png bootstrap.bundle.min.js bootstrap.css custom.css fa.js favicon-16x16.png favicon-32x32.png favicon.ico .gitignore index.php jquery-3.6.3.min.js site.webmanifest wspr_ini.php shutdown.php"
 WWWREMOV="bootstrap-icons.css custom.min.css ham_white.svg README.md"
 # This should not change
@@ -608,10 +608,8 @@ createdaemon () {
     if [ -n "$arguments" ]; then execStart="${execStart} $arguments"; fi
 
     if [ -f "$unitFile" ]; then
-        echo -e "\nStopping $daemonName daemon.";
-        systemctl stop "$daemonName";
-        echo -e "Disabling $daemonName daemon.";
-        systemctl disable "$daemonName";
+        echo -e "\nStopping and disabling $daemonName daemon.";
+        systemctl disable --now "$daemonName";
         echo -e "Removing unit file $unitFile";
         rm "$unitFile"
     fi
@@ -644,10 +642,8 @@ WantedBy=multi-user.target"
     chmod 0644 "$unitFile"
     echo -e "Reloading systemd config."
     systemctl daemon-reload
-    echo -e "Enabling $daemonName daemon."
-    eval "systemctl enable $daemonName"
-    echo -e "Starting $daemonName daemon."
-    eval "systemctl restart $daemonName"
+    echo -e "Enabling and starting $daemonName daemon."
+    eval "systemctl enable --now $daemonName"
     echo
 }
 
@@ -879,6 +875,8 @@ main() {
     copy_logd "$@" # Enable log rotation
     aptPackages # Install any apt packages needed
     doWWW # Download website
+    # Restart so shutdown-watch picks up inotify_simple and the pin setting
+    systemctl restart shutdown-watch
     disable_sound
     echo -e "\n***Script $THISSCRIPT complete.***\n"
     complete
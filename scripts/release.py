@@ -1,77 +1,107 @@
 #!/usr/bin/python3
 
-import subprocess, os
-from fileinput import FileInput
+import subprocess, os, re, shutil, tempfile
+from functools import lru_cache
+
+@lru_cache(maxsize=1)
+def get_project_dir():
+    # Walk up to the directory holding .git rather than asking git; the
+    # release runs from one directory so the answer is cached
+    path = os.getcwd()
+    while not os.path.exists(os.path.join(path, ".git")):
+        parent = os.path.dirname(path)
+        if parent == path:
+            project_dir_command = ["git", "rev-parse", "--show-toplevel"]
+            return subprocess.check_output(project_dir_command, text=True).strip()
+        path = parent
+    return path
+
 
 def get_git():
     print("Getting environment info")
-    # Get Git project name
     global project
-    projcmd = "git rev-parse --show-toplevel"
+    global version
+    global commit
+    global branch
+
+    # Get Git project name
     try:
-        project = subprocess.check_output(projcmd, shell=True).decode().strip()
-        project = project.split("/")
-        project = project[len(project)-1]
+        project = os.path.basename(get_project_dir())
     except:
         project = "unknown"
 
-    # Get 0.0.0 version from latest Git tag
-    global version
-    tagcmd = "git describe --tags --abbrev=0 --always"
+    # Get branch name from Git
     try:
-        version = subprocess.check_output(tagcmd, shell=True).decode().strip()
+        branch = subprocess.check_output(["git", "rev-parse", "--abbrev-ref", "HEAD"], text=True).strip()
     except:
-        version = "0.0.0"
+        branch = "unknown"
 
-    # Get latest commit short from Git
-    global commit
-    revcmd = "git log --pretty=format:'%h' -n 1"
+    # Get 0.0.0 version from latest Git tag and latest commit short from a
+    # single describe, formatted as "tag-count-ghash"
     try:
-        commit = subprocess.check_output(revcmd, shell=True).decode().strip()
+        describe = subprocess.check_output(["git", "describe", "--tags", "--long", "--always"], text=True).strip()
+        parts = describe.rsplit("-", 2)
+        if len(parts) == 3:
+            version = parts[0]
+            commit = parts[2][1:]
+        else:
+            # No tags yet, describe only gives the short commit, so use the
+            # full hash as the tag
+            version = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+            commit = describe
     except:
+        version = "0.0.0"
         commit = "0000000"
 
-    # Get branch name from Git
-    global branch
-    branchcmd = "git rev-parse --abbrev-ref HEAD"
-    try:
-        branch = subprocess.check_output(branchcmd, shell=True).decode().strip()
-    except:
-        branch = "unknown"
-
 
-def replace_in_file(file, string, replace, withquotes=True):
+def replace_in_file(file, replacements, withquotes=True):
     global version
     print("Changing {} to version {}.".format(file, version))
-    with FileInput(files=file, inplace=True) as f:
-        for line in f:
-            if string in line:
-                if not withquotes:
-                    line = string + "" + replace + "\n"
-                else:
-                    line = string + "\"" + replace + "\"\n"
-            print(line, end='')
+    # Find whole lines starting with any of this file's prefixes in one pass
+    alternation = "|".join(re.escape(string) for string in replacements)
+    prefixes = re.compile("^(" + alternation + ")[^\n]*\n?", re.MULTILINE)
+    # Build each replacement line once up front
+    newlines = {}
+    for string, replace in replacements.items():
+        if not withquotes:
+            newlines[string] = string + "" + replace + "\n"
+        else:
+            newlines[string] = string + "\"" + replace + "\"\n"
+    # Edit the text in memory so the file is only written once
+    with open(file) as f:
+        original = f.read()
+    updated = prefixes.sub(lambda match: newlines[match.group(1)], original)
+    # Leave files which are already up to date untouched
+    if updated == original:
+        return
+    # Write beside the original and rename it into place, so an interrupted
+    # release never leaves a truncated script behind
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(file) or ".")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(updated)
+        shutil.copymode(file, temp)
+        os.replace(temp, file)
+    except:
+        os.remove(temp)
+        raise
 
 
 def edit_files():
     global version
     global branch
     global project
-    replace_in_file("install.sh", "VERSION=", version)
-    replace_in_file("uninstall.sh", "VERSION=", version)
-    replace_in_file("install.sh", "BRANCH=", branch)
-    replace_in_file("uninstall.sh", "BRANCH=", branch)
-    replace_in_file("shutdown-watch.py", "# Created for " + project + " version ", version, False)
-    replace_in_file("logrotate.d", "# Created for " + project + " version ", version, False)
+    replace_in_file("install.sh", {"VERSION=": version, "BRANCH=": branch})
+    replace_in_file("uninstall.sh", {"VERSION=": version, "BRANCH=": branch})
+    replace_in_file("shutdown-watch.py", {"# Created for " + project + " version ": version}, False)
+    replace_in_file("logrotate.d", {"# Created for " + project + " version ": version}, False)
 
 
 def compile():
     global project
     global version
     current_dir = os.getcwd()
-    project_dir_command = "git rev-parse --show-toplevel"
-    project_dir = subprocess.check_output(project_dir_command, shell=True).decode().strip()
-    source_dir = project_dir + "/src"
+    source_dir = get_project_dir() + "/src"
     os.chdir(source_dir)
     print("Compiling {} version {}.".format(project, version))
     compile_command = "make clean && make"
@@ -81,9 +111,7 @@ def compile():
 
 def copy(file):
     current_dir = os.getcwd()
-    project_dir_command = "git rev-parse --show-toplevel"
-    project_dir = subprocess.check_output(project_dir_command, shell=True).decode().strip()
-    source_dir = project_dir + "/src"
+    source_dir = get_project_dir() + "/src"
     copy_command = "cp -f " + source_dir + "/" + file + " " + current_dir
     print("Copying {} to {}.".format(file, current_dir))
     subprocess.check_output(copy_command, shell=True)
@@ -1,10 +1,25 @@
 #!/usr/bin/python3
 # Created for WsprryPi version 1.2.0
 
-from gpiozero import Button
 from time import sleep
-from os import system, getuid, path, remove
-from sys import stdout, exit
+from os import environ, execvp, geteuid, path, remove
+from signal import signal, SIGINT, SIGTERM, SIGHUP
+from selectors import DefaultSelector, EVENT_READ
+from threading import Lock
+from sys import stdin, stdout, stderr, exit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+import atexit
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+else:
+    # Files landing in the web directory, and the directory itself going away
+    watchMask = (flags.CREATE | flags.CLOSE_WRITE | flags.MOVED_TO |
+                 flags.DELETE_SELF | flags.MOVE_SELF)
 
 # Debugging for local work
 debug = False
@@ -17,54 +32,212 @@ stopPin = "BOARD35"
 
 # Filename for web-initiated shutdown
 stopFile = "/var/www/html/wspr/shutdown"
+stopDir, stopName = path.split(stopFile)
+
+# Signals which end the watch, and how to report them
+signalNames = {
+    SIGINT: "SIGINT (Ctrl-C)",
+    SIGTERM: "SIGTERM (terminate)",
+    SIGHUP: "SIGHUP (hangup)",
+}
+
+# Debug shutdown countdown broadcasts: (seconds to wait, when it goes down)
+debugCountdown = (
+    (30, "in 30 seconds"),
+    (20, "in 10 seconds"),
+    (9, "now"),
+)
+
+# Taken by the first trigger so repeat presses or requests are ignored
+shutdownLock = Lock()
+
+log = logging.getLogger("shutdown-watch")
+logListener = None
+
+def setupLogging():
+    global logListener
+    # Send warnings and errors to stderr only, so systemd files them in the
+    # error log and everything else in the transmit log
+    formatter = logging.Formatter("%(message)s")
+    stdoutHandler = logging.StreamHandler(stdout)
+    stdoutHandler.addFilter(lambda record: record.levelno < logging.WARNING)
+    stderrHandler = logging.StreamHandler(stderr)
+    stderrHandler.setLevel(logging.WARNING)
+    for handler in (stdoutHandler, stderrHandler):
+        handler.setFormatter(formatter)
+    # Write records from a listener thread so callers, including the signal
+    # handler, never wait on the log files
+    queue = SimpleQueue()
+    logListener = QueueListener(queue, stdoutHandler, stderrHandler, respect_handler_level=True)
+    logListener.start()
+    atexit.register(logListener.stop)
+    log.addHandler(QueueHandler(queue))
+    log.setLevel(logging.DEBUG if debug else logging.INFO)
+
 
 def isRoot():
-    if getuid() != 0:
+    return geteuid() == 0
+
+
+def handleSignal(signum, frame):
+    log.info("Received %s, exiting.", signalNames[signum])
+    exit(0)
+
+
+def stopRequested():
+    # Check for and consume the semaphore with a single unlink
+    try:
+        remove(stopFile)
+        return True
+    except FileNotFoundError:
         return False
+
+
+def run(*args):
+    # Run a command directly, without a shell, and wait for it; a missing
+    # or broken command is reported but never stops the shutdown
+    from subprocess import call
+    try:
+        call(args)
+    except OSError as e:
+        log.warning("Unable to run %s (%s).", args[0], e)
+
+
+def shutdown():
+    if not shutdownLock.acquire(blocking=False):
+        log.debug("Shutdown already in progress.")
+        return
+    try:
+        if (debug):
+            run('wall', 'Shutdown button pressed, system is going down in 60 seconds.')
+            run("shutdown", "-h")
+            log.info("Shutdown initiated.")
+            for wait, when in debugCountdown:
+                sleep(wait)
+                run('wall', 'Shutdown button pressed, system is going down {}.'.format(when))
+        else:
+            log.info("Shutdown initiated.")
+            run('wall', 'Shutdown button pressed, system is going down now.')
+            # Nothing left to do here, become shutdown rather than wait on it
+            if logListener is not None:
+                logListener.stop()
+            try:
+                execvp("shutdown", ["shutdown", "-h", "now"])
+            finally:
+                # Only reached if the exec failed, so logging is needed again
+                if logListener is not None:
+                    logListener.start()
+    except Exception as e:
+        # Let a later press or request try again
+        log.error("Shutdown failed (%s).", e)
+        shutdownLock.release()
+
+
+def pollFile(untilWatchable=False):
+    # Poll for the semaphore, or only until the web directory can be watched
+    while not (untilWatchable and path.isdir(stopDir)):
+        if stopRequested():
+            shutdown()
+        sleep(1)
+
+
+def watchDir(inotify, selector):
+    # Sleep in the kernel until something is written to the web directory,
+    # return if the directory is removed or moved and the watch is lost
+    wd = inotify.add_watch(stopDir, watchMask)
+    # Catch a semaphore written while the directory was not watched
+    if stopRequested():
+        shutdown()
+    while (True):
+        for key, mask in selector.select():
+            for event in inotify.read(timeout=0):
+                if event.wd != wd:
+                    continue
+                if event.mask & flags.MOVE_SELF:
+                    # A moved directory keeps its watch, drop it ourselves
+                    try:
+                        inotify.rm_watch(wd)
+                    except OSError:
+                        pass
+                if event.mask & (flags.IGNORED | flags.DELETE_SELF | flags.MOVE_SELF):
+                    log.warning("Lost watch on %s, waiting for it to return.", stopDir)
+                    return
+                if event.name == stopName and stopRequested():
+                    shutdown()
+
+
+def watchFile():
+    # Catch a semaphore left behind before we started
+    if stopRequested():
+        shutdown()
+
+    if INotify is None:
+        log.debug("inotify_simple not available, polling %s.", stopFile)
     else:
-        return True
+        try:
+            inotify = INotify()
+            selector = DefaultSelector()
+            selector.register(inotify, EVENT_READ)
+            # Arm the watch once the directory exists, which may be after we
+            # start on a fresh install, and re-arm it whenever it is recreated
+            while (True):
+                pollFile(untilWatchable=True)
+                try:
+                    watchDir(inotify, selector)
+                except FileNotFoundError:
+                    # Removed again before we could watch it
+                    pass
+        except OSError as e:
+            log.warning("Unable to watch %s (%s), polling instead.", stopDir, e)
+
+    # No inotify support, fall back to polling for the semaphore
+    pollFile()
 
 
 def main():
-    stopButton = Button(stopPin) # defines the button as an object and chooses GPIO pin
-    print("\nMonitoring pin {} for shutdown signal.".format(stopPin))
-    print("Ctrl-C to quit.\n")
+    # Only load gpiozero (and claim the pin) when the button is in use
+    stopButton = None
+    if (doTAPR):
+        try:
+            from gpiozero import Button
+        except ImportError:
+            log.error("gpiozero is required to monitor the shutdown button.")
+            exit(1)
+        # Prefer lgpio, which waits on kernel edge events, unless told otherwise
+        if "GPIOZERO_PIN_FACTORY" not in environ:
+            try:
+                from gpiozero import Device
+                from gpiozero.pins.lgpio import LGPIOFactory
+                Device.pin_factory = LGPIOFactory()
+            except Exception as e:
+                log.debug("lgpio pin factory not available (%s), using default.", e)
+        # Debounce in gpiozero and require the button be held for half a second
+        stopButton = Button(stopPin, bounce_time=0.05, hold_time=0.5)
+        stopButton.when_held = shutdown
+        log.info("Monitoring pin %s for shutdown signal.", stopPin)
+    log.info("Monitoring %s for shutdown signal.", stopFile)
+    if stdin.isatty():
+        log.info("Ctrl-C to quit.")
+
+    for signum in signalNames:
+        signal(signum, handleSignal)
 
+    # The button is handled by gpiozero's edge callbacks, the main thread
+    # waits on the semaphore
     try:
-        while (True):
-            if (stopButton.is_pressed and doTAPR) or path.isfile(stopFile):
-                sleep(0.5)
-                if stopButton.is_pressed or path.isfile(stopFile):
-                    if path.isfile(stopFile):
-                        remove(stopFile)
-                    if (debug):
-                        system('wall Shutdown button pressed, system is going down in 60 seconds.')
-                        system("shutdown -h")
-                        print('\nShutdown initiated.')
-                        sleep(30)
-                        system('wall Shutdown button pressed, system is going down in 30 seconds.')
-                        sleep(20)
-                        system('wall Shutdown button pressed, system is going down in 10 seconds.')
-                        sleep(9)
-                        system('wall Shutdown button pressed, system is going down now.')
-                    else:
-                        print('\nShutdown initiated.')
-                        system('wall Shutdown button pressed, system is going down now.')
-                        system("shutdown -h now")
-            sleep(0.1)
-
-    except KeyboardInterrupt:
-        print('\n\nKeyboard interrupt.')
+        watchFile()
 
     finally:
-        pass
+        if stopButton is not None:
+            stopButton.close()
 
     return
 
 
 if __name__ == "__main__":
+    setupLogging()
     if not (isRoot()):
-        print("\nScript must be run as root.")
+        log.error("Script must be run as root.")
         exit(1)
     else:
         main()
@@ -208,12 +208,9 @@ die() {
 ############
 
 uninstall() {
-    systemctl stop wspr.service 2>/dev/null
-    systemctl disable wspr.service 2>/dev/null
-    systemctl stop shutdown-button.service 2>/dev/null
-    systemctl stop shutdown-watch.service 2>/dev/null
-    systemctl disable shutdown-button.service 2>/dev/null
-    systemctl disable shutdown-watch.service 2>/dev/null
+    systemctl disable --now wspr.service 2>/dev/null
+    systemctl disable --now shutdown-button.service 2>/dev/null
+    systemctl disable --now shutdown-watch.service 2>/dev/null
     rm -f /etc/systemd/system/wspr.service 2>/dev/null
     rm -f /usr/local/bin/wspr 2>/dev/null
     rm -f /usr/local/etc/wspr.ini 2>/dev/null
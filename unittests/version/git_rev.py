@@ -2,36 +2,34 @@
 
 import subprocess
 
-# Get Git project name
-projcmd = "git rev-parse --show-toplevel"
+# Get Git project name and branch name from a single rev-parse
+projcmd = ["git", "rev-parse", "--show-toplevel", "--abbrev-ref", "HEAD"]
 try:
-    project = subprocess.check_output(projcmd, shell=True).decode().strip()
+    project, branch = subprocess.check_output(projcmd, text=True).splitlines()
     project = project.split("/")
     project = project[len(project)-1]
 except:
     project = "unknown"
+    branch = "unknown"
 
-# Get 0.0.0 version from latest Git tag
-tagcmd = "git describe --tags --abbrev=0 --always"
+# Get 0.0.0 version from latest Git tag and latest commit short from a
+# single describe, formatted as "tag-count-ghash"
+tagcmd = ["git", "describe", "--tags", "--long", "--always"]
 try:
-    version = subprocess.check_output(tagcmd, shell=True).decode().strip()
+    describe = subprocess.check_output(tagcmd, text=True).strip()
+    parts = describe.rsplit("-", 2)
+    if len(parts) == 3:
+        version = parts[0]
+        commit = parts[2][1:]
+    else:
+        # No tags yet, describe only gives the short commit, so use the
+        # full hash as the tag
+        version = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+        commit = describe
 except:
     version = "0.0.0"
-
-# Get latest commit short from Git
-revcmd = "git log --pretty=format:'%h' -n 1"
-try:
-    commit = subprocess.check_output(revcmd, shell=True).decode().strip()
-except:
     commit = "0000000"
 
-# Get branch name from Git
-branchcmd = "git rev-parse --abbrev-ref HEAD"
-try:
-    branch = subprocess.check_output(branchcmd, shell=True).decode().strip()
-except:
-    branch = "unknown"
-
 # Make all available for use in the macros
 print("-D MAKE_SRC_NAM={0}".format(project))
 print("-D MAKE_SRC_TAG={0}".format(version))